@@ -0,0 +1,14 @@
+"""
+Gunicorn configuration for production
+
+Run with: gunicorn main:app -c gunicorn.conf.py
+Each worker is an independent uvicorn event loop (uvloop + httptools).
+"""
+
+import multiprocessing
+
+from settings import settings
+
+bind = f"0.0.0.0:{settings.PORT}"
+workers = settings.WEB_CONCURRENCY or multiprocessing.cpu_count() * 2 + 1
+worker_class = "uvicorn.workers.UvicornWorker"
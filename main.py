@@ -1,32 +1,162 @@
-import os
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Optional
-from datetime import date
+from datetime import date, datetime, timezone
+from uuid import uuid4
+import logging
+from functools import lru_cache
 from bson import ObjectId
-
-from database import db, create_document, get_documents
+from aiocache import Cache
+from aiocache.serializers import PickleSerializer
+from cachetools import TTLCache
+import numpy as np
+import orjson
+import uvloop
+
+try:
+    # Optional: compiles the totals loop when installed, NumPy otherwise
+    from numba import njit
+except ImportError:
+    njit = None
+
+from database import db, create_document, create_documents, get_documents
+from settings import settings
 from schemas import UserProfile, FoodItem, DailyLog, MealEntry, DailyTotals
 
-app = FastAPI(title="Nutri Guide API", version="1.0.0")
+uvloop.install()
+
+logger = logging.getLogger(__name__)
+
+# Reusable dumpers for request bodies written straight to Mongo
+_UP_TA = TypeAdapter(UserProfile)
+_MEAL_TA = TypeAdapter(MealEntry)
+_MEALS_TA = TypeAdapter(List[MealEntry])
+
+# Read cache for profile/log GETs, shared by all workers through Redis. It is
+# off without REDIS_URL: a per-process cache would let one worker serve data
+# another worker just overwrote.
+_CACHE_TTL = 60
+_cache = None
+if settings.REDIS_URL:
+    _cache = Cache.from_url(settings.REDIS_URL)
+    _cache.serializer = PickleSerializer()
+
+
+async def _cache_get(key: str):
+    """Return (value, version); value is None on a miss or a stale entry"""
+    if _cache is None:
+        return None, None
+    try:
+        entry, version = await _cache.multi_get([key, f"ver:{key}"])
+    except Exception:
+        return None, None
+    if entry is not None and entry[0] == version:
+        return entry[1], version
+    return None, version
+
+
+async def _cache_set(key: str, version, value):
+    # Tagged with the version seen before the Mongo read; a write landing in
+    # between replaces the version, so this entry is never served
+    if _cache is None:
+        return
+    try:
+        await _cache.set(key, (version, value), ttl=_CACHE_TTL)
+    except Exception:
+        pass
+
+
+async def _cache_invalidate(key: str):
+    # Called after the Mongo write has committed, so a Redis error must not
+    # fail the request (entry add/delete are not safe to retry). The version
+    # outlives every entry tagged with the previous one, then expires.
+    if _cache is None:
+        return
+    try:
+        await _cache.set(f"ver:{key}", uuid4().hex, ttl=2 * _CACHE_TTL)
+    except Exception:
+        logger.exception("Could not invalidate cache key %s", key)
+
+
+class MongoJSONResponse(ORJSONResponse):
+    """orjson response that also tolerates ObjectId and non-str keys"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+app = FastAPI(title="Nutri Guide API", version="1.0.0", default_response_class=MongoJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=[o.strip() for o in settings.FRONTEND_ORIGIN.split(",") if o.strip()],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "DELETE"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,
 )
 
 
+# Case-insensitive collation shared by the fooditem name index and prefix search
+_NAME_COLLATION = {"locale": "en", "strength": 2}
+
+
+@app.on_event("startup")
+async def ensure_indexes():
+    # Best effort: an unreachable database or duplicate data must not keep the
+    # app from booting; /test and /readyz report the database state
+    if db is None:
+        return
+    indexes = [
+        ("userprofile", "email", {"unique": True}),
+        ("dailylog", [("email", 1), ("date", 1)], {"unique": True}),
+        ("fooditem", [("name", "text")], {}),
+        ("fooditem", [("name", 1)], {"collation": _NAME_COLLATION}),
+    ]
+    for collection, keys, options in indexes:
+        try:
+            await db[collection].create_index(keys, **options)
+        except Exception:
+            logger.exception("Could not create index %s on %s", keys, collection)
+
+
 @app.get("/")
-def root():
+async def root():
     return {"message": "Nutri Guide API is running"}
 
 
+@app.get("/livez")
+async def livez():
+    return {"ok": True}
+
+
+@app.get("/readyz")
+async def readyz():
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not configured")
+    try:
+        await db.command("ping")
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Database unreachable: {str(e)[:50]}")
+    return {"ok": True}
+
+
+# Collection listing is a full Mongo command; /test serves it from here for 30s
+_collections_cache = TTLCache(maxsize=1, ttl=30)
+
+
+async def _collections() -> List[str]:
+    collections = _collections_cache.get("names")
+    if collections is None:
+        collections = await db.list_collection_names()
+        _collections_cache["names"] = collections
+    return collections
+
+
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -39,11 +169,11 @@ def test_database():
     try:
         if db is not None:
             response["database"] = "✅ Available"
-            response["database_url"] = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
+            response["database_url"] = "✅ Set" if settings.DATABASE_URL else "❌ Not Set"
             response["database_name"] = db.name if hasattr(db, 'name') else "✅ Connected"
             response["connection_status"] = "Connected"
             try:
-                collections = db.list_collection_names()
+                collections = await _collections()
                 response["collections"] = collections[:10]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
@@ -65,97 +195,176 @@ class CaloriePlan(BaseModel):
     fat_g: float
 
 
+_ACT = {
+    "sedentary": 1.2,
+    "light": 1.375,
+    "moderate": 1.55,
+    "active": 1.725,
+    "very_active": 1.9,
+}
+
+
 def activity_multiplier(level: str) -> float:
-    return {
-        "sedentary": 1.2,
-        "light": 1.375,
-        "moderate": 1.55,
-        "active": 1.725,
-        "very_active": 1.9,
-    }.get(level, 1.2)
+    return _ACT.get(level, 1.2)
 
 
-def compute_plan(profile: UserProfile) -> CaloriePlan:
-    # Mifflin-St Jeor
-    if profile.gender == "male":
-        bmr = 10 * profile.weight_kg + 6.25 * profile.height_cm - 5 * profile.age + 5
-    else:
-        bmr = 10 * profile.weight_kg + 6.25 * profile.height_cm - 5 * profile.age - 161
+# Mifflin-St Jeor sex offset and goal calorie adjustment
+_GENDER_OFFSET = {"male": 5, "female": -161}
+_GOAL_ADJ = {"lose": 0.8, "maintain": 1.0, "gain": 1.15}
 
-    tdee = bmr * activity_multiplier(profile.activity_level)
+# Macro split: 30% protein, 40% carbs, 30% fat by calories (4/4/9 kcal per g)
+_PROTEIN_G_PER_KCAL = 0.3 / 4
+_CARBS_G_PER_KCAL = 0.4 / 4
+_FAT_G_PER_KCAL = 0.3 / 9
 
-    # Goal adjustment
-    adj = 0
-    if profile.goal == "lose":
-        adj = -0.2
-    elif profile.goal == "gain":
-        adj = 0.15
 
-    goal_cals = tdee * (1 + adj)
+@lru_cache(maxsize=4096)
+def _compute_plan_cached(
+    gender: str, weight_kg: float, height_cm: float, age: int, activity_level: str, goal: str
+) -> tuple:
+    bmr = 10 * weight_kg + 6.25 * height_cm - 5 * age + _GENDER_OFFSET.get(gender, -161)
+    tdee = bmr * activity_multiplier(activity_level)
+    goal_cals = tdee * _GOAL_ADJ.get(goal, 1.0)
 
-    # Macro split: 30% protein, 40% carbs, 30% fat by calories
-    protein_cal = 0.3 * goal_cals
-    carbs_cal = 0.4 * goal_cals
-    fat_cal = 0.3 * goal_cals
+    return (
+        round(tdee, 0),
+        round(goal_cals, 0),
+        round(goal_cals * _PROTEIN_G_PER_KCAL, 0),
+        round(goal_cals * _CARBS_G_PER_KCAL, 0),
+        round(goal_cals * _FAT_G_PER_KCAL, 0),
+    )
 
+
+def compute_plan(profile: UserProfile) -> CaloriePlan:
+    maintenance, goal_cals, protein_g, carbs_g, fat_g = _compute_plan_cached(
+        profile.gender,
+        profile.weight_kg,
+        profile.height_cm,
+        profile.age,
+        profile.activity_level,
+        profile.goal,
+    )
     return CaloriePlan(
-        maintenance_calories=round(tdee, 0),
-        goal_calories=round(goal_cals, 0),
-        protein_g=round(protein_cal / 4, 0),
-        carbs_g=round(carbs_cal / 4, 0),
-        fat_g=round(fat_cal / 9, 0),
+        maintenance_calories=maintenance,
+        goal_calories=goal_cals,
+        protein_g=protein_g,
+        carbs_g=carbs_g,
+        fat_g=fat_g,
     )
 
 
 # --------- Endpoints: Profiles ---------
 @app.post("/api/profile", response_model=CaloriePlan)
-def upsert_profile(profile: UserProfile):
+async def upsert_profile(profile: UserProfile):
     # Upsert by email
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
 
-    existing = db["userprofile"].find_one({"email": profile.email})
-    if existing:
-        db["userprofile"].update_one({"email": profile.email}, {"$set": profile.model_dump()})
-    else:
-        create_document("userprofile", profile)
+    now = datetime.now(timezone.utc)
+    await db["userprofile"].update_one(
+        {"email": profile.email},
+        {"$set": {**_UP_TA.dump_python(profile), "updated_at": now}, "$setOnInsert": {"created_at": now}},
+        upsert=True,
+    )
+    await _cache_invalidate(f"profile:{profile.email}")
 
     return compute_plan(profile)
 
 
 @app.get("/api/profile/{email}")
-def get_profile(email: str):
+async def get_profile(email: str):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    doc = db["userprofile"].find_one({"email": email}, {"_id": 0})
+    key = f"profile:{email}"
+    cached, version = await _cache_get(key)
+    if cached is not None:
+        return cached
+    doc = await db["userprofile"].find_one({"email": email}, {"_id": 0})
     if not doc:
         raise HTTPException(status_code=404, detail="Profile not found")
     plan = compute_plan(UserProfile(**doc))
-    return {"profile": doc, "plan": plan.model_dump()}
+    result = {"profile": doc, "plan": plan.model_dump()}
+    await _cache_set(key, version, result)
+    return result
 
 
 # --------- Endpoints: Food Catalog ---------
+# Upper bound on list length for the bulk endpoints
+_MAX_BULK = 1000
+
+
 @app.post("/api/foods")
-def add_food(item: FoodItem):
+async def add_food(item: FoodItem):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    inserted_id = create_document("fooditem", item)
+    inserted_id = await create_document("fooditem", item)
     return {"id": inserted_id}
 
 
+@app.post("/api/foods/bulk")
+async def add_foods(items: List[FoodItem]):
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not configured")
+    if not items:
+        raise HTTPException(status_code=400, detail="No items")
+    if len(items) > _MAX_BULK:
+        raise HTTPException(status_code=413, detail=f"At most {_MAX_BULK} items per request")
+    inserted_ids = await create_documents("fooditem", items)
+    return {"ids": inserted_ids}
+
+
 @app.get("/api/foods")
-def list_foods(q: Optional[str] = None, limit: int = 50):
+async def list_foods(request: Request, q: Optional[str] = None, limit: int = 50, full_text: bool = False):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
     query = {}
-    if q:
-        query = {"name": {"$regex": q, "$options": "i"}}
-    docs = db["fooditem"].find(query).limit(limit)
-    foods = []
-    for d in docs:
-        d["_id"] = str(d["_id"])
-        foods.append(d)
-    return foods
+    options = {}
+    if q and full_text:
+        query = {"$text": {"$search": q}}
+    elif q:
+        # Case-insensitive prefix match as an index range scan; U+FFFF sorts
+        # after every other character under the collation
+        query = {"name": {"$gte": q, "$lt": q + "\uffff"}}
+        options["collation"] = _NAME_COLLATION
+    # Stringify _id server-side so results need no per-doc Python work
+    pipeline = [{"$match": query}]
+    if limit > 0:
+        pipeline.append({"$limit": limit})
+    pipeline.append({"$addFields": {"_id": {"$toString": "$_id"}}})
+    cursor = db["fooditem"].aggregate(pipeline, **options)
+
+    # The cursor is lazy: pull the first document (and with it the first
+    # batch) now so query errors still surface as an HTTP error, not as a
+    # truncated 200 body
+    try:
+        first = await cursor.next()
+    except StopAsyncIteration:
+        first = None
+
+    async def _docs():
+        if first is None:
+            return
+        yield first
+        async for d in cursor:
+            yield d
+
+    # Emit docs as the cursor yields them instead of building the whole list;
+    # NDJSON on request, otherwise the same JSON array as before
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        async def _gen():
+            async for d in _docs():
+                yield orjson.dumps(d, default=str) + b"\n"
+
+        return StreamingResponse(_gen(), media_type="application/x-ndjson")
+
+    async def _gen_array():
+        sep = b"["
+        async for d in _docs():
+            yield sep + orjson.dumps(d, default=str)
+            sep = b","
+        yield b"[]" if sep == b"[" else b"]"
+
+    return StreamingResponse(_gen_array(), media_type="application/json")
 
 
 # --------- Endpoints: Daily Logs ---------
@@ -165,13 +374,23 @@ class LogRequest(BaseModel):
 
 
 @app.get("/api/log/{email}/{log_date}")
-def get_log(email: str, log_date: str):
+async def get_log(email: str, log_date: str):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    doc = db["dailylog"].find_one({"email": email, "date": log_date})
+    key = f"log:{email}:{log_date}"
+    cached, version = await _cache_get(key)
+    if cached is not None:
+        return cached
+    doc = await db["dailylog"].find_one({"email": email, "date": log_date})
     if not doc:
-        return {"email": email, "date": log_date, "entries": [], "totals": {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}}
-    doc["_id"] = str(doc["_id"])
+        doc = {"email": email, "date": log_date, "entries": [], "totals": {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}}
+    else:
+        doc["_id"] = str(doc["_id"])
+        # Totals accumulate float $inc deltas; "+ 0.0" turns -0.0 into 0.0
+        doc["totals"] = {k: round(v, 1) + 0.0 for k, v in doc.get("totals", {}).items()}
+    # Only past days are cached; today's log is still being written to
+    if log_date < date.today().isoformat():
+        await _cache_set(key, version, doc)
     return doc
 
 
@@ -181,46 +400,107 @@ class AddEntryRequest(BaseModel):
     entry: MealEntry
 
 
-def recalc_totals(entries: List[dict]):
-    totals = {"calories": 0.0, "protein": 0.0, "carbs": 0.0, "fat": 0.0}
-    for e in entries:
-        qty = e.get("quantity", 1)
-        totals["calories"] += e.get("calories", 0) * qty
-        totals["protein"] += e.get("protein", 0) * qty
-        totals["carbs"] += e.get("carbs", 0) * qty
-        totals["fat"] += e.get("fat", 0) * qty
-    return {k: round(v, 1) for k, v in totals.items()}
+def _totals_core(arr):
+    # arr is (N, 5): calories, protein, carbs, fat, quantity
+    return (arr[:, :4] * arr[:, 4:5]).sum(axis=0)
+
+
+if njit is not None:
+    _totals_core = njit(cache=True, fastmath=True)(_totals_core)
+
+
+@app.on_event("startup")
+async def warm_totals_core():
+    # Trigger the Numba compile (or cache load) before serving, not inside
+    # the first bulk request where it would block the event loop
+    _totals_core(np.zeros((1, 5)))
+
+
+def sum_totals(entries: List[dict]) -> dict:
+    """Unrounded quantity-weighted totals, safe to $inc alongside totals_inc"""
+    # One row per entry: calories, protein, carbs, fat, quantity
+    arr = np.fromiter(
+        (
+            v
+            for e in entries
+            for v in (
+                e.get("calories", 0),
+                e.get("protein", 0),
+                e.get("carbs", 0),
+                e.get("fat", 0),
+                e.get("quantity", 1),
+            )
+        ),
+        dtype=np.float64,
+        count=len(entries) * 5,
+    ).reshape(-1, 5)
+    totals = _totals_core(arr)
+    return {k: float(v) for k, v in zip(("calories", "protein", "carbs", "fat"), totals)}
+
+
+def totals_inc(entry: dict, sign: int = 1) -> dict:
+    """$inc spec applying one entry's contribution to the log totals"""
+    qty = entry.get("quantity", 1) * sign
+    return {
+        "totals.calories": entry.get("calories", 0) * qty,
+        "totals.protein": entry.get("protein", 0) * qty,
+        "totals.carbs": entry.get("carbs", 0) * qty,
+        "totals.fat": entry.get("fat", 0) * qty,
+    }
 
 
 @app.post("/api/log/entry")
-def add_entry(payload: AddEntryRequest):
+async def add_entry(payload: AddEntryRequest):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
 
-    # Ensure log exists
-    log = db["dailylog"].find_one({"email": payload.email, "date": payload.date})
-    entry = payload.entry.model_dump()
-
-    if log:
-        entries = log.get("entries", [])
-        entries.append(entry)
-        totals = recalc_totals(entries)
-        db["dailylog"].update_one(
-            {"_id": log["_id"]},
-            {"$set": {"entries": entries, "totals": totals}},
-        )
-        return {"status": "updated"}
-    else:
-        # Create new log
-        totals = recalc_totals([entry])
-        doc = {
-            "email": payload.email,
-            "date": payload.date,
-            "entries": [entry],
-            "totals": totals,
-        }
-        inserted_id = db["dailylog"].insert_one(doc).inserted_id
-        return {"status": "created", "id": str(inserted_id)}
+    # Append and bump totals in one round-trip; creates the log on first entry
+    entry = _MEAL_TA.dump_python(payload.entry)
+    result = await db["dailylog"].update_one(
+        {"email": payload.email, "date": payload.date},
+        {
+            "$push": {"entries": entry},
+            "$inc": totals_inc(entry),
+        },
+        upsert=True,
+    )
+    await _cache_invalidate(f"log:{payload.email}:{payload.date}")
+    if result.upserted_id is not None:
+        return {"status": "created", "id": str(result.upserted_id)}
+    return {"status": "updated"}
+
+
+class AddEntriesRequest(BaseModel):
+    email: str
+    date: str
+    entries: List[MealEntry]
+
+
+@app.post("/api/log/entries")
+async def add_entries(payload: AddEntriesRequest):
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not configured")
+    if not payload.entries:
+        raise HTTPException(status_code=400, detail="No entries")
+    if len(payload.entries) > _MAX_BULK:
+        raise HTTPException(status_code=413, detail=f"At most {_MAX_BULK} entries per request")
+
+    entries = _MEALS_TA.dump_python(payload.entries)
+    # Unrounded, so deleting one of these entries later subtracts exactly
+    # what was added for it
+    totals = sum_totals(entries)
+    result = await db["dailylog"].update_one(
+        {"email": payload.email, "date": payload.date},
+        {
+            "$push": {"entries": {"$each": entries}},
+            "$inc": {f"totals.{k}": v for k, v in totals.items()},
+        },
+        upsert=True,
+    )
+    await _cache_invalidate(f"log:{payload.email}:{payload.date}")
+    if result.upserted_id is not None:
+        return {"status": "created", "id": str(result.upserted_id)}
+    return {"status": "updated"}
 
 
 class DeleteEntryRequest(BaseModel):
@@ -230,22 +510,48 @@ class DeleteEntryRequest(BaseModel):
 
 
 @app.delete("/api/log/entry")
-def delete_entry(payload: DeleteEntryRequest):
+async def delete_entry(payload: DeleteEntryRequest):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    log = db["dailylog"].find_one({"email": payload.email, "date": payload.date})
+    if payload.index < 0:
+        raise HTTPException(status_code=400, detail="Invalid index")
+    # Fetch only the entry being removed
+    log = await db["dailylog"].find_one(
+        {"email": payload.email, "date": payload.date},
+        {"_id": 1, "entries": {"$slice": [payload.index, 1]}},
+    )
     if not log:
         raise HTTPException(status_code=404, detail="Log not found")
-    entries = log.get("entries", [])
-    if payload.index < 0 or payload.index >= len(entries):
+    if not log.get("entries"):
         raise HTTPException(status_code=400, detail="Invalid index")
-    entries.pop(payload.index)
-    totals = recalc_totals(entries)
-    db["dailylog"].update_one({"_id": log["_id"]}, {"$set": {"entries": entries, "totals": totals}})
+    entry = log["entries"][0]
+
+    # Splice the entry out and subtract its totals in one pipeline update, so
+    # the log is never left with a hole; matching on the entry itself keeps a
+    # concurrent delete from decrementing totals twice
+    i = payload.index
+    kept = [{"$slice": ["$entries", i + 1, {"$size": "$entries"}]}]
+    if i > 0:
+        kept.insert(0, {"$slice": ["$entries", i]})
+    delta = totals_inc(entry or {}, -1)
+    result = await db["dailylog"].update_one(
+        {"_id": log["_id"], f"entries.{i}": entry},
+        [
+            {
+                "$set": {
+                    "entries": {"$concatArrays": kept},
+                    **{k: {"$add": [{"$ifNull": [f"${k}", 0]}, v]} for k, v in delta.items()},
+                }
+            }
+        ],
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=409, detail="Log changed, retry")
+    await _cache_invalidate(f"log:{payload.email}:{payload.date}")
     return {"status": "deleted"}
 
 
 if __name__ == "__main__":
+    # Development only; production runs under Gunicorn (see gunicorn.conf.py)
     import uvicorn
-    port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    uvicorn.run(app, host="0.0.0.0", port=settings.PORT, loop="uvloop", http="httptools")
@@ -8,15 +8,20 @@ Each Pydantic model corresponds to a MongoDB collection (lowercased class name).
 - MealEntry -> embedded within DailyLog.entries
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List, Literal
 
+# Shared by every model: drop unknown fields, no re-validation on assignment
+_MODEL_CONFIG = ConfigDict(extra="ignore", validate_assignment=False, str_strip_whitespace=False, frozen=False)
+
 
 class UserProfile(BaseModel):
     """
     User profile and goal settings
     Collection: userprofile
     """
+    model_config = _MODEL_CONFIG
+
     email: str = Field(..., description="Unique email identifier")
     name: Optional[str] = Field(None, description="Full name")
     age: int = Field(..., ge=10, le=120, description="Age in years")
@@ -36,6 +41,8 @@ class FoodItem(BaseModel):
     Food catalog item (per 100g or per serving)
     Collection: fooditem
     """
+    model_config = _MODEL_CONFIG
+
     name: str = Field(..., description="Food name")
     calories: float = Field(..., ge=0, description="kcal per serving")
     protein: float = Field(0, ge=0, description="grams per serving")
@@ -50,6 +57,8 @@ class MealEntry(BaseModel):
     """
     Single meal entry embedded in a daily log
     """
+    model_config = _MODEL_CONFIG
+
     food_id: Optional[str] = Field(None, description="Referenced FoodItem _id as string")
     name: str = Field(..., description="Food name at time of logging")
     calories: float = Field(..., ge=0)
@@ -61,6 +70,8 @@ class MealEntry(BaseModel):
 
 
 class DailyTotals(BaseModel):
+    model_config = _MODEL_CONFIG
+
     calories: float = 0
     protein: float = 0
     carbs: float = 0
@@ -72,6 +83,8 @@ class DailyLog(BaseModel):
     Daily log of meals for a user and date
     Collection: dailylog
     """
+    model_config = _MODEL_CONFIG
+
     email: str = Field(..., description="User email")
     date: str = Field(..., description="YYYY-MM-DD")
     entries: List[MealEntry] = []
@@ -0,0 +1,27 @@
+"""
+Application Settings
+
+Environment variables (and .env) are read once at import; import `settings`
+instead of calling os.getenv in request handlers.
+"""
+
+from typing import Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    DATABASE_URL: Optional[str] = None
+    DATABASE_NAME: Optional[str] = None
+    MONGO_MAX_POOL_SIZE: int = 200
+    PORT: int = 8000
+    # Gunicorn worker count; gunicorn.conf.py defaults to 2 * cpu + 1
+    WEB_CONCURRENCY: Optional[int] = None
+    # Shared read cache for GET endpoints; caching is off when unset
+    REDIS_URL: Optional[str] = None
+    # Comma-separated list of allowed CORS origins
+    FRONTEND_ORIGIN: str = "*"
+
+
+settings = Settings()